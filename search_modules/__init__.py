@@ -1,15 +1,20 @@
 # Copyright (c) 2017 Jonathan Simmonds
 """search_modules module definition"""
-import inspect  # getmembers
-import pkgutil  # walk_packages
+import importlib # import_module
+import pkgutil  # iter_modules
 
 class SearchModule(object):
-    """Wrapper for each loaded search module.
+    """Wrapper for each discovered search module.
+
+    The wrapped Python module is not imported until it is first needed (i.e.
+    when its subparser is created or its version is queried), so discovering
+    the available modules does not pay the import cost of all of them.
 
     Attributes:
         name:       String name uniquely identifying this module from others.
             Not None.
-        version:    String version identifier. May be None.
+        version:    String version identifier. May be None. Reading this will
+            import the wrapped module if it has not already been imported.
         subparser:  Object representing the subparser used by this module to
             contribute its switch and any additional options it permits. This
             object is that returned by argparser.subparser.add_parser().
@@ -18,14 +23,35 @@ class SearchModule(object):
         """Initialise the module.
 
         Args:
-            name:   String name to uniquely identify the module. Not None.
+            name:   String name to uniquely identify the module. This must also
+                be the name of the wrapped module within this package. Not None.
         """
         self.name = name
-        self.version = None
         self.subparser = None
+        self._loaded = False
+        self._version = None
         self._search_func = None
         self._subparser_func = None
 
+    @property
+    def version(self):
+        """String version identifier of the wrapped module. May be None."""
+        self._load()
+        return self._version
+
+    def _load(self):
+        """Imports the wrapped module, if not already imported, and binds its
+        search module interface. Raises an exception if the module is
+        misconfigured/incomplete."""
+        if self._loaded:
+            return
+        py_module = importlib.import_module('%s.%s' % (__name__, self.name))
+        self._version = getattr(py_module, '__version__', None)
+        self._search_func = getattr(py_module, 'search', None)
+        self._subparser_func = getattr(py_module, 'create_subparser', None)
+        self._loaded = True
+        self.validate()
+
     def validate(self):
         """Raise an exception if the module is misconfigured/incomplete."""
         if not self.name:
@@ -49,6 +75,7 @@ class SearchModule(object):
         Returns:
             Object representing the created subparser.
         """
+        self._load()
         # Get the subparser from the wrapped module.
         self.subparser = self._subparser_func(subparsers)
         if not self.subparser:
@@ -59,38 +86,21 @@ class SearchModule(object):
         self.subparser.description = None
         self.subparser.epilog = None
         self.subparser.search_module = self
-        # Set the search callback.
-        self.subparser.set_defaults(search=self._search)
+        # Set the search callback. This is the module's search function itself,
+        # so the parsed args must be split by the caller.
+        self.subparser.set_defaults(search=self._search_func)
         return self.subparser
 
-    def _search(self, args):
-        """Search callback, intended to be called indirectly by the subparser.
-
-        This will accept the parsed args and split them to be passed through to
-        the module.
-        """
-        return self._search_func(args.regex, args.paths, args, args.ignore_case,
-                                 args.verbose)
-
     def __str__(self):
         return '%s %s' % (self.name, self.version) if self.version else self.name
 
-# Exported global to pass the loaded module list.
+# Exported global to pass the discovered module list.
 _search_modules = []
 # Loop through all modules in this directory and create a SearchModule object
-# # from them (i.e. treat everything here implicitly as a search module).
-for loader, module_name, is_pkg in pkgutil.walk_packages(__path__):
-    py_module = loader.find_module(module_name).load_module(module_name)
-    search_module = SearchModule(module_name)
-    for member_name, value in inspect.getmembers(py_module):
-        if member_name == '__version__':
-            search_module.version = value
-        elif member_name == 'search':
-            search_module._search_func = value
-        elif member_name == 'create_subparser':
-            search_module._subparser_func = value
-    search_module.validate()
-    _search_modules.append(search_module)
+# from them (i.e. treat everything here implicitly as a search module). The
+# modules themselves are imported lazily by the SearchModule.
+for _, module_name, _ in pkgutil.iter_modules(__path__):
+    _search_modules.append(SearchModule(module_name))
 
 # Export the module class definition and the list of all loaded modules.
 __all__ = ['SearchModule', '_search_modules']
@@ -5,15 +5,31 @@ This will ignore .git and .svn directories.
 """
 import os
 import re
+from itertools import chain
 from search_utils.printer import MultiLinePrinter
 from search_utils.result import SearchResult, StringMatch
 
+# Directory walking function. From Python 3.5 os.walk is implemented with
+# os.scandir, which avoids a stat call per directory entry; on older Pythons
+# use the equivalent from the scandir package if it is available.
+if hasattr(os, 'scandir'):
+    walk = os.walk
+else:
+    try:
+        from scandir import walk
+    except ImportError:
+        walk = os.walk
+
 # Module version.
 __version__ = '1.0'
 
 # Ignored directory names.
 IGNORED_DIRS = ['.git', '.svn']
 
+# Path separators for this platform. If the regex contains any of these it is
+# matched against the whole path rather than just the file/directory name.
+PATH_SEPS = tuple(sep for sep in (os.path.sep, os.path.altsep) if sep)
+
 def search_generator(regex, paths, ignore_case, path_regex):
     """Generator method for search results.
 
@@ -26,18 +42,29 @@ def search_generator(regex, paths, ignore_case, path_regex):
             the entire path or just the file/directory name.
     """
     re_flags = re.IGNORECASE if ignore_case else 0
+    # Compile the regex once up front rather than looking it up in the re
+    # module's cache for every directory entry (and every result).
+    pattern = re.compile(regex, re_flags)
+    regex_search = pattern.search
     for path in paths:
-        for dirname, subdirs, files in os.walk(path):
+        for dirname, subdirs, files in walk(path):
             # Don't recurse into any of the ignored subdirectories.
             for ignored_dir in IGNORED_DIRS:
                 if ignored_dir in subdirs:
                     subdirs.remove(ignored_dir)
             # Match against all remaining files and subdirs in the directory.
-            for node_name in subdirs + files:
-                node_path = os.path.join(dirname, node_name)
-                if re.search(regex, node_path if path_regex else node_name,
-                             flags=re_flags):
-                    yield SearchResult(StringMatch(node_path, regex, ignore_case))
+            # Only build a node's path if it is needed for the match, as most
+            # nodes will not match.
+            for node_name in chain(subdirs, files):
+                if path_regex:
+                    node_path = os.path.join(dirname, node_name)
+                    if regex_search(node_path):
+                        yield SearchResult(StringMatch(node_path, regex,
+                                                       ignore_case, pattern))
+                elif regex_search(node_name):
+                    node_path = os.path.join(dirname, node_name)
+                    yield SearchResult(StringMatch(node_path, regex,
+                                                   ignore_case, pattern))
 
 def search(regex, paths, args, ignore_case=False, verbose=False):
     """Perform the requested search.
@@ -51,7 +78,7 @@ def search(regex, paths, args, ignore_case=False, verbose=False):
             False if it should be case-sensitive.
         verbose:        Boolean, True for verbose output, False otherwise.
     """
-    path_regex = os.path.sep in regex
+    path_regex = any(sep in regex for sep in PATH_SEPS)
     printer = MultiLinePrinter()
     printer.print_results(search_generator(regex, paths, ignore_case, path_regex))
 
@@ -3,65 +3,126 @@
 
 This will ignore .git and .svn directories.
 """
+import re
 import sys
 from search_utils.printer import BufferingTwoColumnPrinter
 from search_utils.process import StreamingProcess
 from search_utils.result import SearchResult, StringMatch, TextFileLocation
 
+# Function to find an executable on the PATH. shutil.which was added in Python
+# 3.3; older Pythons have the equivalent in distutils (which was removed in
+# Python 3.12).
+try:
+    from shutil import which
+except ImportError:
+    from distutils.spawn import find_executable as which
+
 # Module version.
 __version__ = '1.0'
 
-def search_result_from_grep(line, regex=None, ignore_case=False):
+# Regex to split a line of grep output (as called with at least args 'HIZns')
+# into its path, line number and matched line.
+GREP_LINE_RE = re.compile(r'([^\0]+)\0(\d+):(.*)')
+
+# Platform-specific grep arguments, or None if the platform is unsupported.
+if sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
+    # Assume Linux has GNU grep. This has the options:
+    # -r (recursive), -n (print line num), -s (no error messages),
+    # -H (print filename), -Z (NUL terminate filenames),
+    # -I (ignore binary files), -P (Perl regex)
+    GREP_ARGS = ('-rnsHZIP',)
+elif sys.platform.startswith('darwin'):
+    # Assume OSX has BSD grep. This has the options:
+    # -r (recursive), -n (print line num), -s (no error messages),
+    # -H (print filename), --null (NUL terminate filenames),
+    # -I (ignore binary files), -E (extended regex)
+    GREP_ARGS = ('-rnsHIE', '--null')
+else:
+    GREP_ARGS = None
+
+# grep arguments to exclude ignored directories.
+GREP_EXCLUDE_ARGS = ('--exclude-dir=.svn', '--exclude-dir=.git')
+
+def search_result_from_grep(line, regex=None, ignore_case=False,
+                            pattern=None):
     """Creates a SearchResult object from the output of a grep command.
 
     NB: This relies on grep being called with at least args 'HIZns'
 
     Args:
-        line:   String single line of grep output to process.
-        regex:  String regex this result is derived from, or None if unknown.
-            Defaults to None.
+        line:           String single line of grep output to process.
+        regex:          String regex this result is derived from, or None if
+            unknown. Defaults to None.
+        ignore_case:    Boolean, True if the search is case-insensitive, False
+            if it is case-sensitive. Defaults to False.
+        pattern:        Compiled regex object for regex, or None to compile it
+            when the result is formatted. Defaults to None.
 
     Returns:
         The initialised SearchResult.
     """
-    path_split = line.split('\0', 1)
-    if len(path_split) != 2:
+    match = GREP_LINE_RE.match(line)
+    if not match:
         raise Exception('Incorrectly formatted grep output: ' + line)
-    line_split = path_split[1].split(':', 1)
-    if len(line_split) != 2:
-        raise Exception('Incorrectly formatted grep output: ' + line)
-    return SearchResult(StringMatch(line_split[1].strip(), regex, ignore_case),
-                        TextFileLocation(path_split[0], int(line_split[0])))
+    path, line_num, text = match.groups()
+    return SearchResult(StringMatch(text.strip(), regex, ignore_case, pattern),
+                        TextFileLocation(path, int(line_num)))
 
-def grep(regex, paths, ignore_case, verbose):
-    if sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
-        # Assume Linux has GNU grep. This has the options:
-        # -r (recursive), -n (print line num), -s (no error messages),
-        # -H (print filename), -Z (NUL terminate filenames),
-        # -I (ignore binary files), -P (Perl regex)
-        grep_args = ['-rnsHZIP']
-    elif sys.platform.startswith('darwin'):
-        # Assume OSX has BSD grep. This has the options:
-        # -r (recursive), -n (print line num), -s (no error messages),
-        # -H (print filename), --null (NUL terminate filenames),
-        # -I (ignore binary files), -E (extended regex)
-        grep_args = ['-rnsHIE', '--null']
-    else:
-        raise Exception('Unsupported operating system.')
-    if ignore_case:
-        # GNU + BSD grep both have: i (ignore case)
-        grep_args[0] += 'i'
+def print_grep_output(grep_args, regex, ignore_case, verbose):
+    """Runs a grep-like command and prints its results.
+
+    NB: The command's output must be formatted as grep's is when called with
+    at least args 'HIZns' (see search_result_from_grep).
 
-    with StreamingProcess(['grep', '--color=never'] + grep_args +
-                          ['--exclude-dir=.svn', '--exclude-dir=.git',
-                           regex] + paths) as proc:
+    Args:
+        grep_args:      List of string arguments to invoke the command with.
+        regex:          String regular expression being searched with.
+        ignore_case:    Boolean, True if the search is case-insensitive, False
+            if it is case-sensitive.
+        verbose:        Boolean, True for verbose output, False otherwise.
+    """
+    # Compile the regex once for highlighting all the results. grep's regex
+    # syntax isn't quite Python's, so a regex Python can't compile is left to
+    # fail only if there are results to highlight.
+    try:
+        pattern = re.compile(regex, re.IGNORECASE if ignore_case else 0)
+    except re.error:
+        pattern = None
+    with StreamingProcess(grep_args) as proc:
         # printer = SingleLinePrinter(condense_location=not verbose,
         #                             condense_match=not verbose)
         printer = BufferingTwoColumnPrinter(condense_location=not verbose,
                                             condense_match=not verbose)
-        printer.print_results(search_result_from_grep(line, regex, ignore_case)
+        printer.print_results(search_result_from_grep(line, regex, ignore_case,
+                                                      pattern)
                               for line in proc)
 
+def grep(regex, paths, ignore_case, verbose):
+    if GREP_ARGS is None:
+        raise Exception('Unsupported operating system.')
+    grep_args = list(GREP_ARGS)
+    if ignore_case:
+        # GNU + BSD grep both have: i (ignore case)
+        grep_args[0] += 'i'
+
+    print_grep_output(['grep', '--color=never'] + grep_args +
+                      list(GREP_EXCLUDE_ARGS) + [regex] + paths,
+                      regex, ignore_case, verbose)
+
+def ripgrep(regex, paths, ignore_case, verbose):
+    # ripgrep is recursive, ignores binary files and uses a DFA-based regex
+    # engine by default. It has the options:
+    # -n (print line num), -s (case sensitive), -i (ignore case),
+    # -H (print filename), -0 (NUL terminate filenames),
+    # --no-messages (no error messages), --no-heading (grep-style output),
+    # --hidden and --no-ignore (search the same files as grep would)
+    rg_args = ['-nH0', '-i' if ignore_case else '-s', '--no-messages',
+               '--no-heading', '--hidden', '--no-ignore']
+
+    print_grep_output(['rg', '--color=never'] + rg_args +
+                      ['--glob=!.svn', '--glob=!.git', regex] + paths,
+                      regex, ignore_case, verbose)
+
 def search(regex, paths, args, ignore_case=False, verbose=False):
     """Perform the requested search.
 
@@ -74,7 +135,11 @@ def search(regex, paths, args, ignore_case=False, verbose=False):
             False if it should be case-sensitive.
         verbose:        Boolean, True for verbose output, False otherwise.
     """
-    grep(regex, paths, ignore_case, verbose)
+    # ripgrep is optional, so fall back to grep if it isn't installed.
+    if args.ripgrep and which('rg'):
+        ripgrep(regex, paths, ignore_case, verbose)
+    else:
+        grep(regex, paths, ignore_case, verbose)
 
 def create_subparser(subparsers):
     """Creates this module's subparser.
@@ -91,7 +156,11 @@ def create_subparser(subparsers):
         add_help=False,
         help='Search recursively on the contents of any files in the given '
              'paths.')
-    #parser.add_argument('-r', action='store_const',
-    #                    const=True, default=False,
-    #                    help='Use ripgrep instead of grep')
+    parser.add_argument(
+        '-r', '--ripgrep',
+        dest='ripgrep', action='store_const', const=True, default=False,
+        help='Search with ripgrep (rg) instead of grep. This is typically '
+             'much faster, but ripgrep\'s regex syntax does not support '
+             'look-around or backreferences. Falls back to grep if rg is not '
+             'installed.')
     return parser
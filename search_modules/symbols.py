@@ -1,23 +1,120 @@
 # Copyright (c) 2017-2018 Jonathan Simmonds
 """Search module for searching for symbols within objects and archives."""
-import os.path
+import hashlib
+import multiprocessing
+import os
+import pickle
 import re
+import subprocess
 import sys
+from collections import deque
+from itertools import islice
 from search_utils import ansi
 from search_utils.printer import MultiLinePrinter
 from search_utils.process import StreamingProcess
-from search_utils.result import SearchResult, Match, Location, ltrunc, rpad
+from search_utils.result import (SearchResult, Match, Location, ltrunc, rpad,
+                                 regex_literal)
+
+# Directory walking function. os.walk only uses os.scandir (saving a stat per
+# directory entry) from Python 3.5, so use the scandir package's walk before
+# that if it's installed.
+if hasattr(os, 'scandir'):
+    walk = os.walk
+else:
+    try:
+        from scandir import walk
+    except ImportError:
+        walk = os.walk
+
+# Thread pool used to run objdump on several batches of files in parallel, if
+# available. The threads mostly wait on the objdump subprocesses, which run
+# truly in parallel.
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
 
 # Module version.
 __version__ = '1.0'
 
-# List of the known file suffixes to search for object files. May be empty to
-# search all files. Files which are searched which are not of the correct type
-# will be silently ignored, so leaving this empty is most likely to succeed, but
-# may be slower in the presence of lots of non-object files, which will all be
-# parsed to work out if they are actually object files.
-#KNOWN_TYPES = []
-KNOWN_TYPES = ['.o', '.obj', '.a', '.so']
+# Tuple of the known file suffixes to search for object files. May be empty to
+# search all files with a known magic number (see OBJECT_MAGICS). Files which
+# are searched which are not of the correct type will be silently ignored, so
+# leaving this empty is most likely to succeed, but may be slower in the
+# presence of lots of non-object files, each of which must be opened to check
+# its magic number.
+#KNOWN_TYPES = ()
+KNOWN_TYPES = ('.o', '.obj', '.a', '.so')
+
+# Magic numbers at the start of the object file and archive formats objdump is
+# expected to read: ar archives (regular and thin); ELF; Mach-O (32 and 64-bit,
+# either endianness, and universal binaries); and COFF for x86, x86-64, ARM
+# and ARM64. When KNOWN_TYPES is empty files without one of these are skipped,
+# rather than passed to objdump only to be rejected.
+OBJECT_MAGICS = (b'!<arch>\n', b'!<thin>\n', b'\x7fELF',
+                 b'\xfe\xed\xfa\xce', b'\xce\xfa\xed\xfe',
+                 b'\xfe\xed\xfa\xcf', b'\xcf\xfa\xed\xfe',
+                 b'\xca\xfe\xba\xbe',
+                 b'\x4c\x01', b'\x64\x86', b'\xc4\x01', b'\x64\xaa')
+# Number of bytes to read from the start of a file to check its magic number.
+OBJECT_MAGIC_LEN = max(len(magic) for magic in OBJECT_MAGICS)
+
+# Regexes to parse objdump output with.
+# Archive header, as output by some objdumps before the archive's objects.
+ARCHIVE_RE = re.compile(r'.*[Aa]rchive\s+(.+):$')
+# Object file header for either a standalone object or one within an archive.
+OBJECT_RE = re.compile(r'(.*[^\)])(\((.+)\))?:\s+file format')
+# Prefix of objdump's error messages, which are interleaved with its output.
+OBJDUMP_ERROR_PREFIX = 'objdump: '
+# Substrings of objdump's archive and object file header lines. These are much
+# cheaper to search lines for than the header regexes.
+ARCHIVE_HEADER_STR = 'rchive'
+OBJECT_HEADER_STR = 'file format'
+
+# Maximum number of files to pass to a single objdump invocation. objdump can
+# process many files at once, which avoids the cost of spawning it for every
+# file, but the command line length is limited and smaller batches can be spread
+# across more threads.
+OBJDUMP_BATCH_SIZE = 64
+
+# Maximum number of objdump batches to run at once.
+MAX_OBJDUMP_THREADS = multiprocessing.cpu_count()
+
+# Directory to cache the symbols parsed from each file in, if enabled.
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or
+                         os.path.join(os.path.expanduser('~'), '.cache'),
+                         'search', 'symbols')
+
+# Version of the format of the cache files. Cache files of any other version
+# are ignored.
+CACHE_FORMAT = 1
+
+# Symbol flag bits. A Symbol's flags attribute is a bitmask of these.
+FLAG_LOCAL = 1 << 0
+FLAG_GLOBAL = 1 << 1
+FLAG_UNIQUE = 1 << 2
+FLAG_WEAK = 1 << 3
+FLAG_CTOR = 1 << 4
+FLAG_WARNING = 1 << 5
+FLAG_REF = 1 << 6
+FLAG_RELOC = 1 << 7
+FLAG_DEBUG = 1 << 8
+FLAG_DYNAMIC = 1 << 9
+FLAG_FUNC = 1 << 10
+FLAG_FILE = 1 << 11
+FLAG_OBJECT = 1 << 12
+FLAG_DEFINED = 1 << 13
+
+def flag_property(flag):
+    """Creates a read-only property testing one of a Symbol's flags.
+
+    Args:
+        flag:   int FLAG_* bit to test.
+
+    Returns:
+        Property which is True if the flag is set, False otherwise.
+    """
+    return property(lambda self: bool(self.flags & flag))
 
 class Symbol(object):
     """An abstract representation of a single Symbol object.
@@ -28,6 +125,8 @@ class Symbol(object):
         section:    String name of the section this symbol resides in.
         size:       int size of the symbol, typically in bytes.
         name:       String name of the symbol.
+        flags:      int bitmask of the FLAG_* bits set for this symbol. Each is
+            also exposed as one of the read-only Boolean attributes below.
         is_local:   Boolean, True if this symbol has local scope.
         is_global:  Boolean, True if this symbol has global scope.
         is_unique:  Boolean, True if this symbol is a 'unique' global - i.e. it
@@ -50,7 +149,24 @@ class Symbol(object):
         is_defined: Boolean, True if the symbol is defined, False if the symbol
             is just a reference in lieu of a defined version of the symbol.
     """
-    def __init__(self, value, section, size, name):
+    __slots__ = ('value', 'section', 'size', 'name', 'flags')
+
+    is_local = flag_property(FLAG_LOCAL)
+    is_global = flag_property(FLAG_GLOBAL)
+    is_unique = flag_property(FLAG_UNIQUE)
+    is_weak = flag_property(FLAG_WEAK)
+    is_ctor = flag_property(FLAG_CTOR)
+    is_warning = flag_property(FLAG_WARNING)
+    is_ref = flag_property(FLAG_REF)
+    is_reloc = flag_property(FLAG_RELOC)
+    is_debug = flag_property(FLAG_DEBUG)
+    is_dynamic = flag_property(FLAG_DYNAMIC)
+    is_func = flag_property(FLAG_FUNC)
+    is_file = flag_property(FLAG_FILE)
+    is_object = flag_property(FLAG_OBJECT)
+    is_defined = flag_property(FLAG_DEFINED)
+
+    def __init__(self, value, section, size, name, flags=0):
         """Initialises the Symbol.
 
         Args:
@@ -60,27 +176,14 @@ class Symbol(object):
             section:    String name of the section this symbol resides in.
             size:       int size of the symbol, typically in bytes.
             name:       String name of the symbol.
+            flags:      int bitmask of the FLAG_* bits set for the symbol.
+                Defaults to 0 (no flags).
         """
         self.value = value
         self.section = section
         self.size = size
         self.name = name
-        # Zero flags (Symbol itself is considered abstract whereas the flags
-        # are very much implementation details).
-        self.is_local = False
-        self.is_global = False
-        self.is_unique = False
-        self.is_weak = False
-        self.is_ctor = False
-        self.is_warning = False
-        self.is_ref = False
-        self.is_reloc = False
-        self.is_debug = False
-        self.is_dynamic = False
-        self.is_func = False
-        self.is_file = False
-        self.is_object = False
-        self.is_defined = False
+        self.flags = flags
 
     def format_flags(self):
         """Retrieves a textual representation of each of the symbol's flags.
@@ -130,29 +233,81 @@ class Symbol(object):
             return  '  %s\n' \
                     '    UNDEFINED\n%s' % (self.name, flag_str)
 
-    # __repr__ output is the same as as __str__
-    __repr__ = __str__
+    def __repr__(self):
+        # Unlike __str__ this is kept short, as Symbols are typically seen in
+        # bulk (e.g. within an ObjectFile's symbols list).
+        return '%s(%s)' % (self.__class__.__name__, self.name)
 
 
+# The FLAG_* bits set by each character of an objdump ELF symbol table entry's
+# flags, for each of the 7 flag columns. Any other character sets no flags.
+ELF_FLAG_COLUMNS = [
+    {'l': FLAG_LOCAL, 'g': FLAG_GLOBAL, 'u': FLAG_GLOBAL | FLAG_UNIQUE,
+     '!': FLAG_LOCAL | FLAG_GLOBAL},
+    {'w': FLAG_WEAK},
+    {'C': FLAG_CTOR},
+    {'W': FLAG_WARNING},
+    {'i': FLAG_REF, 'I': FLAG_RELOC},
+    {'d': FLAG_DEBUG, 'D': FLAG_DYNAMIC},
+    {'F': FLAG_FUNC, 'f': FLAG_FILE, 'O': FLAG_OBJECT},
+]
+
+# Cache of decoded ELF symbol flags, keyed by the objdump flag string.
+_ELF_FLAGS = {}
+
+# Interned section names. Almost all symbols reside in one of a small number of
+# sections, so this lets them share a single string per section name.
+_SECTIONS = {}
+
+# Maximum number of interned section names. Objects built with
+# -ffunction-sections or -fdata-sections have a section per symbol, so the
+# table is emptied when it fills, keeping memory bounded.
+_CACHE_SIZE = 4096
+
+def intern_section(section):
+    """Interns a section name, so symbols in the same section share a string.
+
+    Args:
+        section:    String section name.
+
+    Returns:
+        String equal to section.
+    """
+    interned = _SECTIONS.get(section)
+    if interned is None:
+        if len(_SECTIONS) >= _CACHE_SIZE:
+            _SECTIONS.clear()
+        interned = _SECTIONS.setdefault(section, section)
+    return interned
+
+def decode_elf_flags(flags):
+    """Decodes the flag characters of an objdump ELF symbol table entry.
+
+    Only a handful of distinct flag strings occur in practice, so the decoded
+    flags are cached, making repeated calls cheap.
+
+    Args:
+        flags:  String of the 7 flag characters from the symbol table entry.
+
+    Returns:
+        int bitmask of the FLAG_* bits set by the flag characters.
+    """
+    decoded = _ELF_FLAGS.get(flags)
+    if decoded is None:
+        decoded = 0
+        for column, char in zip(ELF_FLAG_COLUMNS, flags):
+            decoded |= column.get(char, 0)
+        _ELF_FLAGS[flags] = decoded
+    return decoded
+
 class ELFSymbol(Symbol):
     """A Symbol object representing an ELF formatted symbol."""
+    __slots__ = ()
+
     def __init__(self, value, flags, section, size, name):
-        Symbol.__init__(self, int(value, 16), section, int(size, 16), name)
-        # Parse flags.
-        self.is_local   = flags[0] in ['l', '!']
-        self.is_global  = flags[0] in ['g', 'u', '!']
-        self.is_unique  = flags[0] == 'u'
-        self.is_weak    = flags[1] == 'w'
-        self.is_ctor    = flags[2] == 'C'
-        self.is_warning = flags[3] == 'W'
-        self.is_ref     = flags[4] == 'i'
-        self.is_reloc   = flags[4] == 'I'
-        self.is_debug   = flags[5] == 'd'
-        self.is_dynamic = flags[5] == 'D'
-        self.is_func    = flags[6] == 'F'
-        self.is_file    = flags[6] == 'f'
-        self.is_object  = flags[6] == 'O'
-        self.is_defined = section != '*UND*'
+        Symbol.__init__(self, int(value, 16), section, int(size, 16), name,
+                        decode_elf_flags(flags) |
+                        (FLAG_DEFINED if section != '*UND*' else 0))
 
 
 class ObjectFile(object):
@@ -169,6 +324,8 @@ class ObjectFile(object):
             its location).
         symbols:        List of Symbols contained in this object file.
     """
+    __slots__ = ('object_path', 'archive_path', 'abs_path', 'symbols')
+
     def __init__(self, object_path, archive_path):
         """Initialises the ObjectFile.
 
@@ -196,8 +353,11 @@ class ObjectFile(object):
         return 'OBJECT FILE %s:\n' % (self.abs_path) + \
                '\n'.join([str(s) for s in self.symbols])
 
-    # __repr__ output is the same as as __str__
-    __repr__ = __str__
+    def __repr__(self):
+        # Unlike __str__ this doesn't print every symbol, which for a large
+        # object file would be enormous.
+        return '%s(%s, %d symbols)' % (self.__class__.__name__, self.abs_path,
+                                       len(self.symbols))
 
 
 class SymbolMatch(Match):
@@ -209,8 +369,12 @@ class SymbolMatch(Match):
             unknown.
         ignore_case:    Boolean, True if case was ignored when matching the
             regex, False if case was not ignored.
+        pattern:        Compiled regex object for regex (with ignore_case
+            applied), or None to compile it when needed.
     """
-    def __init__(self, symbol, regex=None, ignore_case=None):
+    __slots__ = ('symbol', 'regex', 'ignore_case', 'pattern')
+
+    def __init__(self, symbol, regex=None, ignore_case=None, pattern=None):
         """Initialises the Match.
 
         Args:
@@ -219,11 +383,15 @@ class SymbolMatch(Match):
                 if unknown.
             ignore_case:    Boolean, True if case was ignored when matching the
                 regex, False if case was not ignored.
+            pattern:        Compiled regex object for regex (with ignore_case
+                applied), or None to compile it when needed. Passing this
+                avoids recompiling the regex for every match. Defaults to None.
         """
         super(SymbolMatch, self).__init__()
         self.symbol = symbol
         self.regex = regex
         self.ignore_case = ignore_case
+        self.pattern = pattern
 
     def format(self, decorate=True, min_width=0, max_width=0):
         flags = self.symbol.format_flags()
@@ -240,12 +408,21 @@ class SymbolMatch(Match):
         # Build and decorate the name string.
         # If decorating and we know the regex, highlight the search term.
         if decorate and self.regex:
-            re_flags = re.IGNORECASE if self.ignore_case else 0
-            re_split = re.split('(%s)' % (self.regex), self.symbol.name,
-                                flags=re_flags)
-            for i in range(1, len(re_split), 2):
-                re_split[i] = ansi.decorate(re_split[i], ansi.BOLD, ansi.FG_RED)
-            name_str = '  Name:    %s' % (''.join(re_split))
+            pattern = self.pattern
+            if pattern is None:
+                re_flags = re.IGNORECASE if self.ignore_case else 0
+                pattern = re.compile(self.regex, re_flags)
+            name = self.symbol.name
+            parts = []
+            end = 0
+            for match in pattern.finditer(name):
+                if match.end() > match.start():
+                    parts.append(name[end:match.start()])
+                    parts.append(ansi.decorate(match.group(0), ansi.BOLD,
+                                               ansi.FG_RED))
+                    end = match.end()
+            parts.append(name[end:])
+            name_str = '  Name:    %s' % (''.join(parts))
         else:
             name_str = '  Name:    %s' % (self.symbol.name)
 
@@ -268,6 +445,8 @@ class ObjectFileLocation(Location):
         object_file:    ObjectFile object representing the parsed object file in
             which the match was found.
     """
+    __slots__ = ('object_file',)
+
     def __init__(self, object_file):
         """Initialises the Location.
 
@@ -284,12 +463,15 @@ class ObjectFileLocation(Location):
     __repr__ = __str__
 
     def format(self, decorate=True, min_width=0, max_width=0):
-        if self.object_file.archive_path:
-            formatted = ltrunc(self.object_file.abs_path, max_width)
+        abs_path = self.object_file.abs_path
+        archive_path = self.object_file.archive_path
+        formatted = ltrunc(abs_path, max_width)
+        if archive_path:
             # Archive path formatting
-            abs_len = len(self.object_file.abs_path)
-            path_len = len(self.object_file.archive_path)
-            dir_len = len(os.path.dirname(self.object_file.archive_path) + os.path.sep)
+            abs_len = len(abs_path)
+            path_len = len(archive_path)
+            archive_dir = os.path.dirname(archive_path)
+            dir_len = len(archive_dir) + len(os.path.sep) if archive_dir else 0
             obj_len = len(self.object_file.object_path)
             # Split with right-references to take into account that we may have
             # just truncated the parts we're trying to split out.
@@ -311,9 +493,8 @@ class ObjectFileLocation(Location):
             formatted = ''.join(split)
             return rpad(formatted, min_width)
         else:
-            formatted = ltrunc(self.object_file.abs_path, max_width)
             # Object path formatting
-            base_len = len(os.path.basename(self.object_file.abs_path))
+            base_len = len(os.path.basename(abs_path))
             split = [formatted[:-base_len], formatted[-base_len:]]
             if split[0]:    # Object dirname
                 split[0] = ansi.decorate(split[0], ansi.FG_YELLOW)
@@ -325,109 +506,166 @@ class ObjectFileLocation(Location):
     def length(self):
         return len(self.object_file.abs_path)
 
-def parse_symbol(line):
+def parse_symbol(line, name_search=None):
     """Parses a Symbol from an objdump symbol table entry.
 
+    Only ELF (and Mach-O, which objdump formats similarly) symbol table entries
+    are supported. objdump lists COFF symbols in another format entirely, e.g.:
+        [  4](sec  3)(fl 0x00)(ty   0)(scl   3) (nx 1) 0x00000000 .bss
+    which is not parsed.
+
     Args:
-        line:   String line from an objdump symbol table entry.
+        line:           String line from an objdump symbol table entry.
+        name_search:    Function which, given a symbol name, returns a true
+            value if the symbol is of interest, or None if all symbols are of
+            interest. Symbols which aren't of interest are not constructed.
+            Defaults to None.
 
     Returns:
-        Symbol subclass parsed from the line, or None if it couldn't be parsed.
+        Symbol subclass parsed from the line, False if the line is a symbol
+        which isn't of interest, or None if it couldn't be parsed.
     """
-    def _parse_elfsymbol(line):
-        # First try the standard ELF symbol table encoding.
-        match = re.match(r'^(\S+)\s(.{7})\s(\S+)\s(\S+)\s(.+)$', line)
-        if match:
-            return ELFSymbol(*match.groups())
-        # Failing that, try the bastardised Mach-O symbol table encoding.
-        match = re.match(r'^(\S+)\s(.{7})\s(\S+)\s(.+)$', line)
-        if match:
-            return ELFSymbol(match.group(1), match.group(2), match.group(3), '0', match.group(4))
-        return None
-
-    def _parse_othersymbol(line):
-        """
-                [  4](sec  3)(fl 0x00)(ty   0)(scl   3) (nx 1) 0x00000000 .bss
-                [  6](sec  1)(fl 0x00)(ty   0)(scl   2) (nx 0) 0x00000000 fred
-
-        where the number inside the square brackets is the number of the entry in
-        the symbol table, the sec number is the section number, the fl value are the
-        symbol's flag bits, the ty number is the symbol's type, the scl number is
-        the symbol's storage class and the nx value is the number of auxilary
-        entries associated with the symbol. The last two fields are the symbol's
-        value and its name.
-        """
+    # The symbol table is column-aligned: the value, a space, a fixed-width
+    # block of 7 flag characters, a space, then the section, size and name.
+    # Parse the columns directly.
+    flags_start = line.find(' ') + 1
+    flags_end = flags_start + 7
+    if flags_start < 2 or len(line) <= flags_end or \
+       not line[flags_end].isspace():
         return None
+    value = line[:flags_start - 1]
+    flags = line[flags_start:flags_end]
+    section, tab, rest = line[flags_end + 1:].partition('\t')
+    # First try the standard ELF symbol table encoding, which separates the
+    # section from the size with a tab. The name may be empty.
+    if tab:
+        fields = rest.split(None, 1)
+        if not section or not fields:
+            return None
+        name = fields[1] if len(fields) == 2 else ''
+        if name_search is not None and not name_search(name):
+            return False
+        return ELFSymbol(value, flags, intern_section(section),
+                         fields[0], name)
+    # Failing that, try the bastardised Mach-O symbol table encoding, which
+    # lacks the size.
+    fields = section.split(None, 1)
+    if len(fields) == 2:
+        if name_search is not None and not name_search(fields[1]):
+            return False
+        return ELFSymbol(value, flags, intern_section(fields[0]), '0',
+                         fields[1])
+    return None
 
-    if not line:
-        return None
-    # Return first successful parsing.
-    sym = _parse_elfsymbol(line)
-    if sym is not None:
-        return sym
-    return _parse_othersymbol(line)
+def parse_objdump(paths, objdump, name_search=None):
+    """Generator method to parse ObjectFiles from the objdump output of one or
+    more files.
 
-def parse_object_file(path, objdump):
-    """Parses an ObjectFile from an objdump output.
+    objdump prints the output for each of the files it is given in turn, and
+    prints error messages (e.g. for files which are not objects) inline. Each
+    file's output starts with either an archive header or an object file header
+    naming the file as it was given, which is used to attribute the objects
+    which follow to the correct file.
 
     Args:
-        path:       String path to the object file.
-        objdump:    List of strings of lines of objdump output to parse.
+        paths:      List of string paths to the files objdump was invoked on, in
+            the order they were given to it (before conversion by
+            objdump_path).
+        objdump:        Iterable of strings of lines of objdump output to parse.
+        name_search:    Function which, given a symbol name, returns a true
+            value if the symbol is of interest, or None if all symbols are of
+            interest. Symbols which aren't of interest are omitted. Defaults to
+            None.
 
-    Returns:
-        ObjectFile object representing the parsed object file.
+    Yields:
+        ObjectFile objects parsed from the given files. Each is yielded once all
+        of its symbols have been parsed.
     """
-    objfile = ObjectFile(path, None)
-    for line in objdump:
-        sym = parse_symbol(line)
-        if not sym:
-            if objfile.symbols:
-                break
-            continue
-        objfile.symbols.append(sym)
-    return objfile
-
-def parse_archive(path, objdump):
-    """Parses a list of ObjectFiles from an objdump archive output.
-
-    Args:
-        path:       String path to the archive.
-        objdump:    List of strings of lines of objdump output to parse.
-
-    Returns:
-        List of ObjectFile objects representing the objects contained within the
-        archive.
-    """
-    object_files = []
+    path_indices = dict((objdump_path(path), i) for i, path in enumerate(paths))
+    next_index = 0
+    archive_path = None
+    object_file = None
     current_file = None
     for line in objdump:
-        if not line:
+        if not line or line.startswith(OBJDUMP_ERROR_PREFIX):
             continue
-        match = re.match(r'^(.*[^\)])(\((.+)\))?:\s+file format', line)
+        # Is this the start of an archive? Only try the header regexes on lines
+        # which might be headers, as almost all lines are symbols.
+        match = ARCHIVE_HEADER_STR in line and ARCHIVE_RE.match(line)
+        if match and path_indices.get(match.group(1), -1) >= next_index:
+            if object_file:
+                yield object_file
+            object_file = current_file = None
+            next_index = path_indices[match.group(1)] + 1
+            archive_path = paths[next_index - 1]
+            continue
+        # Is this the start of an object file?
+        match = OBJECT_HEADER_STR in line and OBJECT_RE.match(line)
         if match:
-            filename = match.group(3) if match.group(3) else match.group(1)
-            current_file = ObjectFile(filename, path)
-            object_files.append(current_file)
+            if object_file:
+                yield object_file
+            if match.group(3):
+                # Some objdumps name the archive alongside each of its objects.
+                index = path_indices.get(match.group(1), -1)
+                object_file = ObjectFile(match.group(3), paths[index] if
+                                         index >= 0 else match.group(1))
+            elif archive_path and \
+                 path_indices.get(match.group(1), -1) < next_index:
+                object_file = ObjectFile(match.group(1), archive_path)
+            else:
+                archive_path = None
+                index = path_indices.get(match.group(1), -1)
+                if index >= next_index:
+                    next_index = index + 1
+                    object_file = ObjectFile(paths[index], None)
+                else:
+                    object_file = ObjectFile(match.group(1), None)
+            current_file = object_file
             continue
         if not current_file:
-            raise Exception('Archive does not specify object to attribute '
-                            'symbols to ' + path)
-        sym = parse_symbol(line)
-        if not sym:
+            continue
+        sym = parse_symbol(line, name_search)
+        if sym is None:
             if current_file.symbols:
                 current_file = None
             continue
-        current_file.symbols.append(sym)
-    return object_files
+        if sym:
+            current_file.symbols.append(sym)
+    if object_file:
+        yield object_file
+
+def objdump_path(path):
+    """Converts a path to the form it is passed to objdump in.
 
-def parse_file(path):
-    """Parses a file for ObjectFiles.
+    objdump names the objects within an archive by their bare file names, so
+    any path without a directory component is given one to prevent it being
+    confused with an archive's object in the output.
 
     Args:
-        path:   String path to the file.
+        path:   String path to a file.
 
     Returns:
-        List of ObjectFile objects parsed from the given file.
+        String path to the same file, with a directory component.
+    """
+    if os.path.dirname(path):
+        return path
+    return os.path.join(os.curdir, path)
+
+def parse_batch(paths, pattern=None):
+    """Generator method to parse a single batch of files for ObjectFiles.
+
+    The files are passed to a single objdump invocation and its output is parsed
+    as it is produced.
+
+    Args:
+        paths:      List of string paths to the files.
+        pattern:    Compiled regex object which the names of all symbols of
+            interest contain a match for, or None if all symbols are of
+            interest. If given, other symbols are omitted. Defaults to None.
+
+    Yields:
+        ObjectFile objects parsed from the given files. Files which are not
+        archives or object files are silently ignored.
     """
     if sys.platform.startswith('linux') or sys.platform.startswith('cygwin'):
         # Assume Linux has GNU objdump. This has the options:
@@ -437,57 +675,317 @@ def parse_file(path):
         # Assume OSX has LLVM objdump. This has the options:
         # -t (list symbols)
         objdump_args = ['objdump', '-t']
-    objdump_args.append(path)
-    with StreamingProcess(objdump_args) as proc:
-        # Find the first non-blank line.
-        first_line = proc.peek()
-        while not first_line:
-            try:
-                proc.next()
-                first_line = proc.peek()
-            except StopIteration:
-                return []
-        # Is this an archive?
-        match = re.match(r'^.*[Aa]rchive\s+(.+):$', first_line)
-        if match:
-            # In this format we have to skip this descriptive line.
-            proc.next()
-            return parse_archive(match.group(1), proc)
-        # Some objdumps format archives differently.
-        match = re.match(r'^(.+)\((.+)\):\s+file format', first_line)
-        if match:
-            return parse_archive(match.group(1), proc)
-        # Otherwise maybe it's an object file?
-        match = re.match(r'^(.+):\s+file format', first_line)
-        if match:
-            return [parse_object_file(match.group(1), proc)]
-        # Otherwise it's not an archive or object file.
-        return []
+    objdump_args += [objdump_path(path) for path in paths]
+    name_search = pattern.search if pattern else None
+    literal = regex_literal(pattern.pattern) if pattern else None
+    # grep may only fold the case of ASCII characters (depending on the locale),
+    # unlike Python's IGNORECASE, so it could drop matching symbols.
+    if (literal is not None and pattern.flags & re.IGNORECASE and
+            any(ord(c) > 127 for c in literal)):
+        literal = None
+    if literal is None:
+        with StreamingProcess(objdump_args) as proc:
+            for object_file in parse_objdump(paths, proc, name_search):
+                yield object_file
+        return
+    # Typically only a tiny fraction of symbols contain the literal, so have
+    # grep drop the rest (keeping the headers) before they reach Python.
+    grep_args = ['grep', '-F', '-e', literal, '-e', ARCHIVE_HEADER_STR,
+                 '-e', OBJECT_HEADER_STR]
+    if pattern.flags & re.IGNORECASE:
+        grep_args.insert(1, '-i')
+    objdump = subprocess.Popen(objdump_args, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    try:
+        with StreamingProcess(grep_args, stdin=objdump.stdout) as proc:
+            # Only grep should hold the pipe open, so objdump sees it close if
+            # grep exits.
+            objdump.stdout.close()
+            for object_file in parse_objdump(paths, proc, name_search):
+                yield object_file
+    finally:
+        if objdump.poll() is None:
+            objdump.terminate()
+        objdump.wait()
+
+def cache_file_path(path):
+    """Retrieves the path of the cache file for a file.
+
+    Args:
+        path:   String path to the file.
+
+    Returns:
+        String path to the file's cache file within CACHE_DIR.
+    """
+    key = os.path.abspath(path)
+    if not isinstance(key, bytes):
+        key = key.encode('utf-8', 'surrogateescape')
+    return os.path.join(CACHE_DIR, hashlib.sha1(key).hexdigest())
+
+def file_stamp(path):
+    """Retrieves a stamp which changes whenever a file is modified.
+
+    Args:
+        path:   String path to the file.
+
+    Returns:
+        Tuple of the file's modification time and size, or None if the file
+        cannot be accessed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    # Prefer the exact nanosecond mtime where the platform provides it.
+    return (getattr(stat, 'st_mtime_ns', stat.st_mtime), stat.st_size)
+
+def load_cache(path, stamp):
+    """Loads the ObjectFiles parsed from a file from the cache.
 
-def search_file(path, regex, ignore_case, include_undefined, printer):
-    """Perform the requested search on a file.
+    Args:
+        path:   String path to the file.
+        stamp:  Stamp of the file, as returned by file_stamp.
+
+    Returns:
+        List of ObjectFile objects parsed from the file, or None if the file
+        has not been cached since it was last modified.
+    """
+    if stamp is None:
+        return None
+    try:
+        with open(cache_file_path(path), 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+        cached_format, cached_stamp, cached_objects = cached
+    except Exception:
+        # Missing, corrupt or incompatible (e.g. written by a different
+        # version of Python) cache files are all just cache misses.
+        return None
+    if cached_format != CACHE_FORMAT or cached_stamp != stamp:
+        return None
+    # The cache doesn't record the path the file was given by, so rebuild the
+    # ObjectFiles around the given path.
+    object_files = []
+    for object_path, symbols in cached_objects:
+        if object_path is None:
+            object_file = ObjectFile(path, None)
+        else:
+            object_file = ObjectFile(object_path, path)
+        object_file.symbols = [Symbol(*fields) for fields in symbols]
+        object_files.append(object_file)
+    return object_files
+
+def store_cache(path, stamp, object_files):
+    """Stores the ObjectFiles parsed from a file in the cache. Failure to store
+    them is silently ignored. CACHE_DIR must already exist (see
+    create_cache_dir).
+
+    Args:
+        path:           String path to the file.
+        stamp:          Stamp of the file before it was parsed, as returned by
+            file_stamp.
+        object_files:   List of ObjectFile objects parsed from the file.
+    """
+    if stamp is None:
+        return
+    # Symbols are stored as plain tuples of their fields, which are much
+    # quicker to pickle and unpickle than the objects themselves.
+    cached_objects = [(object_file.object_path if object_file.archive_path
+                       else None,
+                       [(symbol.value, symbol.section, symbol.size, symbol.name,
+                         symbol.flags) for symbol in object_file.symbols])
+                      for object_file in object_files]
+    cache_path = cache_file_path(path)
+    temp_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        with open(temp_path, 'wb') as cache_file:
+            pickle.dump((CACHE_FORMAT, stamp, cached_objects), cache_file,
+                        pickle.HIGHEST_PROTOCOL)
+        # Replace the cache file atomically so concurrent searches never see a
+        # partially written one.
+        os.rename(temp_path, cache_path)
+    except (EnvironmentError, pickle.PickleError):
+        # Don't leave a partially written file behind in the cache.
+        try:
+            os.unlink(temp_path)
+        except EnvironmentError:
+            pass
+
+def create_cache_dir():
+    """Creates CACHE_DIR if it doesn't already exist. Failure to create it is
+    silently ignored (the files are then simply not cached).
+    """
+    try:
+        if not os.path.isdir(CACHE_DIR):
+            os.makedirs(CACHE_DIR)
+    except EnvironmentError:
+        pass
+
+def parse_cached_batch(paths):
+    """Generator method to parse a single batch of files for ObjectFiles,
+    using the cache.
+
+    Files which have not changed since they were cached are loaded from the
+    cache. The rest are passed to a single objdump invocation, and the
+    ObjectFiles parsed from them are cached.
+
+    Args:
+        paths:  List of string paths to the files.
+
+    Yields:
+        ObjectFile objects parsed from the given files, in the order the files
+        were given. Files which are not archives or object files are silently
+        ignored.
+    """
+    stamps = dict((path, file_stamp(path)) for path in paths)
+    parsed = {}
+    for path in paths:
+        object_files = load_cache(path, stamps[path])
+        if object_files is not None:
+            parsed[path] = object_files
+    misses = [path for path in paths if path not in parsed]
+    unattributed = []
+    if misses:
+        for path in misses:
+            parsed[path] = []
+        for object_file in parse_batch(misses):
+            path = object_file.archive_path or object_file.object_path
+            if path in parsed:
+                parsed[path].append(object_file)
+            else:
+                unattributed.append(object_file)
+        # Files objdump could not parse are not cached, in case that was a
+        # failure of objdump itself.
+        for path in misses:
+            if parsed[path]:
+                store_cache(path, stamps[path], parsed[path])
+    for path in paths:
+        for object_file in parsed[path]:
+            yield object_file
+    for object_file in unattributed:
+        yield object_file
+
+def parse_files(paths, use_cache=False, pattern=None):
+    """Generator method to parse files for ObjectFiles.
+
+    The files are passed to objdump in batches, to avoid spawning a process per
+    file. If a thread pool is available several batches are parsed in parallel,
+    otherwise each batch's output is parsed as it is produced.
+
+    Args:
+        paths:          Iterable of string paths to the files.
+        use_cache:      Boolean, True to load the ObjectFiles of files which
+            have not changed since they were last parsed from the cache (and to
+            cache the rest), False to always parse the files. Defaults to
+            False.
+        pattern:        Compiled regex object which the names of all symbols
+            of interest contain a match for, or None if all symbols are of
+            interest. If given, other symbols may be omitted. Ignored if
+            use_cache is True, as all symbols must be cached. Defaults to None.
+
+    Yields:
+        ObjectFile objects parsed from the given files, in the order the files
+        were given. Files which are not archives or object files are silently
+        ignored.
+    """
+    if use_cache:
+        # Create the cache directory once up front, as the batches may be
+        # stored concurrently from several threads.
+        create_cache_dir()
+        parse_func = parse_cached_batch
+    else:
+        parse_func = lambda batch: parse_batch(batch, pattern)
+    paths = iter(paths)
+    batches = iter(lambda: list(islice(paths, OBJDUMP_BATCH_SIZE)), [])
+    if ThreadPoolExecutor is None:
+        for batch in batches:
+            for object_file in parse_func(batch):
+                yield object_file
+        return
+    with ThreadPoolExecutor(MAX_OBJDUMP_THREADS) as executor:
+        # Keep a bounded number of batches in flight, each parsed in full by a
+        # worker thread, and collect their results in order.
+        pending = deque()
+        for batch in batches:
+            pending.append(executor.submit(list, parse_func(batch)))
+            if len(pending) >= MAX_OBJDUMP_THREADS:
+                for object_file in pending.popleft().result():
+                    yield object_file
+        while pending:
+            for object_file in pending.popleft().result():
+                yield object_file
+
+def has_object_magic(path):
+    """Checks whether a file starts with one of the OBJECT_MAGICS.
+
+    Args:
+        path:   String path to the file.
+
+    Returns:
+        Boolean, True if the file starts with a known object file or archive
+        magic number, False if it doesn't or cannot be read.
+    """
+    try:
+        with open(path, 'rb') as candidate:
+            return candidate.read(OBJECT_MAGIC_LEN).startswith(OBJECT_MAGICS)
+    except EnvironmentError:
+        return False
+
+def object_paths(paths):
+    """Generator method for the files to search for ObjectFiles.
+
+    Args:
+        paths:  List of strings representing the paths to search in/on.
+            Directories are searched recursively for files with any of the
+            KNOWN_TYPES suffixes or, if KNOWN_TYPES is empty, any files with
+            one of the OBJECT_MAGICS.
+
+    Yields:
+        String paths to the files to search.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for dirname, subdirs, files in walk(path):
+                for filename in files:
+                    if KNOWN_TYPES:
+                        if filename.endswith(KNOWN_TYPES):
+                            yield os.path.join(dirname, filename)
+                    else:
+                        file_path = os.path.join(dirname, filename)
+                        if has_object_magic(file_path):
+                            yield file_path
+        else:
+            yield path
+
+def search_generator(regex, paths, ignore_case, include_undefined,
+                     use_cache=False):
+    """Generator method for search results.
 
     Args:
-        path:               String path to a file to search.
         regex:              String regular expression to search with.
+        paths:              List of strings representing the paths to search.
         ignore_case:        Boolean, True if the search should be
             case-insensitive, False if it should be case-sensitive.
         include_undefined:  Boolean, True if the search should include symbols
             which are undefined.
-        printer:            AbstractPrinter subclass to use to print the results
-            to the search.
+        use_cache:          Boolean, True to cache the symbols parsed from each
+            file for use by later searches. Defaults to False.
     """
     re_flags = re.IGNORECASE if ignore_case else 0
-    object_files = parse_file(path)
-    results = []
-    for object_file in object_files:
-        for symbol in object_file.symbols:
-            if not include_undefined and not symbol.is_defined:
-                continue
-            if re.search(regex, symbol.name, flags=re_flags):
-                results.append(SearchResult(SymbolMatch(symbol, regex, ignore_case),
-                                            ObjectFileLocation(object_file)))
-    printer.print_results(results)
+    # There may be millions of symbols to test, so avoid re.search's per-call
+    # pattern cache lookup.
+    pattern = re.compile(regex, re_flags)
+    name_search = pattern.search
+    # Non-matching symbols are (mostly) filtered out during parsing, but not
+    # from cached files, so still check every symbol.
+    for object_file in parse_files(object_paths(paths), use_cache, pattern):
+        symbols = object_file.symbols
+        if not include_undefined:
+            symbols = [symbol for symbol in symbols if symbol.is_defined]
+        for symbol in symbols:
+            if name_search(symbol.name):
+                yield SearchResult(SymbolMatch(symbol, regex, ignore_case,
+                                               pattern),
+                                   ObjectFileLocation(object_file))
 
 def search(regex, paths, args, ignore_case=False, verbose=False):
     """Perform the requested search.
@@ -502,16 +1000,8 @@ def search(regex, paths, args, ignore_case=False, verbose=False):
         verbose:        Boolean, True for verbose output, False otherwise.
     """
     printer = MultiLinePrinter()
-    for path in paths:
-        if os.path.isdir(path):
-            for dirname, subdirs, files in os.walk(path):
-                for filename in files:
-                    if not KNOWN_TYPES or any([filename.endswith(suffix) for
-                                               suffix in KNOWN_TYPES]):
-                        search_file(os.path.join(dirname, filename), regex,
-                                    ignore_case, args.undefined, printer)
-        else:
-            search_file(path, regex, ignore_case, args.undefined, printer)
+    printer.print_results(search_generator(regex, paths, ignore_case,
+                                           args.undefined, args.cache))
 
 def create_subparser(subparsers):
     """Creates this module's subparser.
@@ -533,4 +1023,11 @@ def create_subparser(subparsers):
         dest='undefined', action='store_const', const=True, default=False,
         help='Also print undefined symbols (i.e. in objects which reference '
              'but don\'t define the symbol).')
+    parser.add_argument(
+        '-c', '--cache',
+        dest='cache', action='store_const', const=True, default=False,
+        help='Cache the symbols parsed from each file (in '
+             '$XDG_CACHE_HOME/search/symbols, defaulting to '
+             '~/.cache/search/symbols) so later searches need not parse '
+             'unchanged files again.')
     return parser
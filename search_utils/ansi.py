@@ -1,5 +1,6 @@
 # Copyright (c) 2017-2018 Jonathan Simmonds
 """Utilities for adding ANSI formatting to a string for console output."""
+import re
 
 RESET =       0 # Resets text
 BOLD =        1 # Bold / increased intensity
@@ -23,11 +24,21 @@ BG_MAGENTA = 45 # Background highlight magenta
 BG_CYAN =    46 # Background highlight cyan
 BG_WHITE =   47 # Background highlight white
 
+# Escape code to reset all formatting.
+RESET_CODE = '\033[0m'
+
+# Cache of the escape codes starting each combination of formats, keyed by the
+# tuple of format enums.
+_START_CODES = {}
+
+# Regex matching a single ANSI escape code.
+ESCAPE_CODE_RE = re.compile(r'\033\[[^m]+m')
+
 def decorate(string, *formats):
     """Decorates a string using ANSI escape codes given some format enums.
 
     Calling len(s) on a string which has been decorated in this manner will not
-    return the printed width. Call len(ansi_undecorate(s)) to achieve this.
+    return the printed width. Call length(s) to achieve this.
 
     Args:
         string:     string to decorate.
@@ -39,15 +50,14 @@ def decorate(string, *formats):
     # If no formats have been given, do nothing
     if not formats:
         return string
-    # Otherwise construct the start code
-    start = '\033['
-    for fmt in formats:
-        start += str(fmt) + ';'
-    # Remove final ';', append an 'm'
-    start = start[:-1] + 'm'
+    # Otherwise construct the start code, or reuse it if these formats have
+    # been used before (only a handful of combinations ever are).
+    start = _START_CODES.get(formats)
+    if start is None:
+        start = '\033[%sm' % (';'.join(str(fmt) for fmt in formats))
+        _START_CODES[formats] = start
     # Hard coded reset code to finish
-    end = '\033[0m'
-    return start + string + end
+    return start + string + RESET_CODE
 
 def undecorate(string):
     """Removes all ANSI escape codes from a given string.
@@ -58,8 +68,11 @@ def undecorate(string):
     Returns:
         Undecorated, plain string.
     """
-    import re
-    return re.sub(r'\033\[[^m]+m', '', string)
+    # Most strings aren't decorated, so avoid the regex unless there are
+    # escape codes to remove.
+    if '\033' not in string:
+        return string
+    return ESCAPE_CODE_RE.sub('', string)
 
 def length(string):
     """Returns the visible length of a (potentially) ANSI decorated string.
@@ -70,4 +83,8 @@ def length(string):
     Returns:
         int length of string.
     """
-    return len(undecorate(string))
+    if '\033' not in string:
+        return len(string)
+    # Subtract the length of the escape codes rather than copying out all the
+    # visible text to measure it.
+    return len(string) - len(''.join(ESCAPE_CODE_RE.findall(string)))
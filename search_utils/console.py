@@ -4,6 +4,13 @@ import fcntl
 import termios
 import struct
 
+# Function to query the terminal size, from Python 3.3. Older Pythons must
+# make the ioctl themselves.
+try:
+    from os import get_terminal_size
+except ImportError:
+    get_terminal_size = None
+
 _CONSOLE_CACHE = None
 
 def size(use_cache=True):
@@ -17,9 +24,12 @@ def size(use_cache=True):
     global _CONSOLE_CACHE
     if not use_cache or not _CONSOLE_CACHE:
         try:
-            h, w, hp, wp = struct.unpack('HHHH', fcntl.ioctl(1,
-                termios.TIOCGWINSZ, struct.pack('HHHH', 0, 0, 0, 0)))
-        except IOError:
+            if get_terminal_size:
+                w, h = get_terminal_size(1)
+            else:
+                h, w, hp, wp = struct.unpack('HHHH', fcntl.ioctl(1,
+                    termios.TIOCGWINSZ, struct.pack('HHHH', 0, 0, 0, 0)))
+        except (IOError, OSError):
             w, h = (80, 40)
         _CONSOLE_CACHE = (w, h)
     return _CONSOLE_CACHE
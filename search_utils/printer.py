@@ -1,5 +1,6 @@
 # Copyright (c) 2017 Jonathan Simmonds
 """Module providing printers for printing streamed SearchResults."""
+import sys
 from search_utils import console
 
 class AbstractPrinter(object):
@@ -50,15 +51,17 @@ class BufferingTwoColumnPrinter(AbstractPrinter):
     def print_results(self, result_iterable):
         console_width, console_height = console.size()
         results = []
-        max_loc_col = 0
-        max_match_col = 0
-        # Scoop out all results and the max string information.
+        loc_lens = []
+        match_lens = []
+        # Scoop out all results and their string lengths.
         for result in result_iterable:
             if not result:
                 continue
             results.append(result)
-            max_loc_col = max(result.location.length(), max_loc_col)
-            max_match_col = max(result.match.length(), max_match_col)
+            loc_lens.append(result.location.length())
+            match_lens.append(result.match.length())
+        max_loc_col = max(loc_lens) if loc_lens else 0
+        max_match_col = max(match_lens) if match_lens else 0
         # Work out what we can do with them.
         min_loc_col = min(self.max_minimisation, max_loc_col) \
                         if self.condense_location else max_loc_col
@@ -66,39 +69,44 @@ class BufferingTwoColumnPrinter(AbstractPrinter):
                           if self.condense_match else max_match_col
 
         # If the longest line can fit on the screen, print normally.
+        separator = ' '
         if max_loc_col + self.col_spacing + max_match_col <= console_width:
-            for result in results:
-                print result.format(decorate=self.decorate,
-                                    match_col_width=max_match_col,
-                                    loc_col_width=max_loc_col)
+            match_col_width = max_match_col
+            loc_col_width = max_loc_col
         # If we can't print normally, could we print if we minimised just the
         # location column (prefer condensing location to match)?
         elif min_loc_col + self.col_spacing + max_match_col <= console_width:
             # If that will fit, print the maximum we can get away with.
-            for result in results:
-                print result.format(decorate=self.decorate,
-                                    match_col_width=max_match_col,
-                                    loc_col_width=console_width - max_match_col - self.col_spacing)
+            match_col_width = max_match_col
+            loc_col_width = console_width - max_match_col - self.col_spacing
         # If we still can't fit anything in, could we print if we minimised just
         # the match column?
         elif max_loc_col + self.col_spacing + min_match_col <= console_width:
             # If that will fit, print the maximum we can get away with.
-            for result in results:
-                print result.format(decorate=self.decorate,
-                                    match_col_width=console_width - max_loc_col - self.col_spacing,
-                                    loc_col_width=max_loc_col)
+            match_col_width = console_width - max_loc_col - self.col_spacing
+            loc_col_width = max_loc_col
         # If that still isn't working, what about if we minimised both sides?
         elif min_loc_col + self.col_spacing + min_match_col <= console_width:
             # If that will fit, print the columns in a 1:2 ratio.
-            for result in results:
-                print result.format(decorate=self.decorate,
-                                    match_col_width=(console_width / 3) * 2,
-                                    loc_col_width=console_width / 3)
+            match_col_width = (console_width // 3) * 2
+            loc_col_width = console_width // 3
         # If all else fails, just print the results on separate lines
         else:
-            for result in results:
-                print result.format(decorate=self.decorate,
-                                    separator='\n') + '\n'
+            match_col_width = 0
+            loc_col_width = 0
+            separator = '\n'
+
+        # All the results are already in memory, so print them with a single
+        # write rather than one per line.
+        lines = [result.format(decorate=self.decorate,
+                               match_col_width=match_col_width,
+                               loc_col_width=loc_col_width,
+                               separator=separator)
+                 for result in results]
+        if separator == '\n':
+            lines = [line + '\n' for line in lines]
+        if lines:
+            sys.stdout.write('\n'.join(lines) + '\n')
 
 
 class SingleLinePrinter(AbstractPrinter):
@@ -135,26 +143,31 @@ class SingleLinePrinter(AbstractPrinter):
             match_len = result.match.length()
             # Can we just print the line?
             if loc_len + self.col_spacing + match_len <= console_width:
-                print result.format(decorate=self.decorate)
+                match_col_width = 0
+                loc_col_width = 0
             # If not, can we print it if we squish the location column?
             elif (self.condense_location and self.max_minimisation +
                   self.col_spacing + match_len <= console_width):
-                print result.format(decorate=self.decorate,
-                                    loc_col_width=console_width - match_len - self.col_spacing)
+                match_col_width = 0
+                loc_col_width = console_width - match_len - self.col_spacing
             # If not, can we print it if we squish the match column?
             elif (self.condense_match and loc_len + self.col_spacing +
                   self.max_minimisation <= console_width):
-                print result.format(decorate=self.decorate,
-                                    match_col_width=console_width - loc_len - self.col_spacing)
+                match_col_width = console_width - loc_len - self.col_spacing
+                loc_col_width = 0
             # If not, can we print it if we squish both columns?
             elif (self.condense_location and self.condense_match and
                   self.max_minimisation * 2 + self.col_spacing <= console_width):
-                print result.format(decorate=self.decorate,
-                                    match_col_width=(console_width / 3) * 2,
-                                    loc_col_width=console_width / 3) - self.col_spacing
+                match_col_width = (console_width // 3) * 2
+                loc_col_width = console_width // 3 - self.col_spacing
             # If all else fails, just print the whole lot together.
             else:
-                print result.format(decorate=self.decorate)
+                match_col_width = 0
+                loc_col_width = 0
+            # Write the line and its newline together.
+            sys.stdout.write(result.format(decorate=self.decorate,
+                                           match_col_width=match_col_width,
+                                           loc_col_width=loc_col_width) + '\n')
 
 class MultiLinePrinter(AbstractPrinter):
     """A printer which prints each result from an iterator fully across multiple
@@ -170,6 +183,7 @@ class MultiLinePrinter(AbstractPrinter):
             if not result:
                 continue
             if result.location:
-                print result.format(decorate=self.decorate, separator='\n') + '\n'
+                sys.stdout.write(result.format(decorate=self.decorate,
+                                               separator='\n') + '\n\n')
             else:
-                print result.format(decorate=self.decorate)
+                sys.stdout.write(result.format(decorate=self.decorate) + '\n')
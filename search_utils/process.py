@@ -11,24 +11,30 @@ class StreamingProcess(object):
     ...
     with StreamingProcess(['ls', '-l']) as proc:
         for line in proc:
-            print line
-        print proc.returncode
+            print(line)
+        print(proc.returncode)
     ...
 
     Attributes:
         arglist:    List of string arguments to invoke the subprocess with.
+        stdin:      File object used as the subprocess's stdin, or None if it
+            inherits this process's stdin.
         proc:       Popen object representing the underlying subprocess.
         returncode: int return code of the subprocess, set to None if the
             process has not yet exitted.
     """
-    def __init__(self, arglist):
+    def __init__(self, arglist, stdin=None):
         """Creates the context manager. The subprocess is not spawned until
         entered.
 
         Args:
             arglist:    List of string arguments to invoke the subprocess with.
+            stdin:      File object to use as the subprocess's stdin (e.g. the
+                stdout of another subprocess, to build a pipeline), or None to
+                inherit this process's stdin. Defaults to None.
         """
         self.arglist = arglist
+        self.stdin = stdin
         self.proc = None
         self.returncode = None
         self._peeked = None
@@ -47,6 +53,7 @@ class StreamingProcess(object):
             block.
         """
         self.proc = subprocess.Popen(self.arglist, bufsize=4096,
+                                     stdin=self.stdin,
                                      stdout=subprocess.PIPE,
                                      stderr=subprocess.STDOUT,
                                      universal_newlines=True)
@@ -104,7 +111,9 @@ class StreamingProcess(object):
             if line:
                 return line[:-1]
             else:
-                self.returncode = self.proc.returncode
+                # The stream is exhausted, so the process has exitted (or is
+                # about to): reap it to retrieve its real return code.
+                self.returncode = self.proc.wait()
                 raise StopIteration
 
     def peek(self):
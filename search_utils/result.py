@@ -4,20 +4,6 @@ import os.path
 import re
 from search_utils import ansi
 
-def lpad(string, width):
-    """Inserts padding to the left of a string to be at least 'width' wide.
-
-    Args:
-        string: String to pad.
-        width:  Width to make the string at least. May be 0 to not pad.
-
-    Returns:
-        Padded string.
-    """
-    if width > 0 and len(string) < width:
-        return ' ' * (width - len(string)) + string
-    return string
-
 def rpad(string, width):
     """Inserts padding to the right of a string to be at least 'width' wide.
 
@@ -28,9 +14,7 @@ def rpad(string, width):
     Returns:
         Padded string.
     """
-    if width > 0 and len(string) < width:
-        return string + ' ' * (width - len(string))
-    return string
+    return string.ljust(width)
 
 def ltrunc(string, width, marker='...'):
     """Truncates a string from the left to be at most 'width' wide.
@@ -62,6 +46,82 @@ def rtrunc(string, width, marker='...'):
         return string[:-(width-len(marker))] + marker
     return string
 
+# Characters with special meaning in a regex. A regex without any of these
+# matches only its literal text.
+REGEX_METACHARS = frozenset('.^$*+?{}[]\\|()')
+
+def regex_literal(regex):
+    """Retrieves the literal text matched by a regex, if it only matches one
+    string.
+
+    Args:
+        regex:  String regular expression.
+
+    Returns:
+        String literal text which is the only thing matched by the regex (i.e.
+        the regex with any escaping of regex metacharacters removed), or None if
+        the regex can match anything else or is empty.
+    """
+    chars = []
+    escaped = False
+    for char in regex:
+        if escaped:
+            # Escaped letters and digits are character classes, backreferences
+            # or the like, but escaping anything else just makes it literal.
+            if char.isalnum():
+                return None
+            chars.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char in REGEX_METACHARS:
+            return None
+        else:
+            chars.append(char)
+    if escaped or not chars:
+        return None
+    return ''.join(chars)
+
+# Maximum number of entries in each of the caches below. Each cache is simply
+# emptied when it fills, keeping memory bounded over very large searches.
+_CACHE_SIZE = 4096
+
+# Cache of the results of regex_literal, keyed by regex.
+_REGEX_LITERALS = {}
+
+# Cache of decorated paths, keyed by (path, basename length).
+_DECORATED_PATHS = {}
+
+def decorate_path(path, basename_len):
+    """Decorates a (potentially left-truncated) path, highlighting the basename.
+
+    Typically many results share the same path so the decorated paths are
+    cached, making repeated calls cheap.
+
+    Args:
+        path:           String path to decorate.
+        basename_len:   int length of the path's basename. If the path is no
+            longer than this the whole path is treated as the basename.
+
+    Returns:
+        Decorated path.
+    """
+    key = (path, basename_len)
+    decorated = _DECORATED_PATHS.get(key)
+    if decorated is None:
+        # If there is some of the dirname visible, split the string and format
+        # it.
+        if len(path) > basename_len:
+            dirname_part = ansi.decorate(path[:-basename_len], ansi.FG_YELLOW)
+            basename_part = ansi.decorate(path[-basename_len:], ansi.BOLD, ansi.FG_YELLOW)
+            decorated = dirname_part + basename_part
+        else:
+            decorated = ansi.decorate(path, ansi.BOLD, ansi.FG_YELLOW)
+        if len(_DECORATED_PATHS) >= _CACHE_SIZE:
+            _DECORATED_PATHS.clear()
+        _DECORATED_PATHS[key] = decorated
+    return decorated
+
 
 # Result type
 
@@ -73,6 +133,8 @@ class SearchResult(object):
         location:   Location subclass describing the location of the result. May
             be None if the SearchResult does not have a location.
     """
+    __slots__ = ('match', 'location')
+
     def __init__(self, match, location=None):
         """Initialises this SearchResult.
 
@@ -82,10 +144,13 @@ class SearchResult(object):
             location:   Location subclass describing the location of the result.
                 May be None if the SearchResult does not have a location.
         """
-        if not isinstance(match, Match):
-            raise TypeError('Invalid match type')
-        if location is not None and not isinstance(location, Location):
-            raise TypeError('Invalid location type')
+        # These checks are for module authors, so skip them when running
+        # optimised (python -O).
+        if __debug__:
+            if not isinstance(match, Match):
+                raise TypeError('Invalid match type')
+            if location is not None and not isinstance(location, Location):
+                raise TypeError('Invalid location type')
         self.match = match
         self.location = location
 
@@ -130,6 +195,8 @@ class SearchResult(object):
 
 class Match(object):
     """An abstract single match to a search query."""
+    __slots__ = ()
+
     def __init__(self):
         """Initialises the Match."""
         pass
@@ -168,11 +235,15 @@ class StringMatch(Match):
             unknown.
         ignore_case:    Boolean, True if case was ignored when matching the
             regex, False if case was not ignored.
+        pattern:        Compiled regex object for regex (with ignore_case
+            applied), or None to compile it when needed.
     """
+    __slots__ = ('match', 'regex', 'ignore_case', 'pattern')
+
     # The character sequence to place at the truncation point in result lines
     _RES_CONT = '...'
 
-    def __init__(self, match, regex=None, ignore_case=False):
+    def __init__(self, match, regex=None, ignore_case=False, pattern=None):
         """Initialises the Match.
 
         Args:
@@ -182,11 +253,16 @@ class StringMatch(Match):
                 unknown.
             ignore_case:    Boolean, True if case was ignored when matching the
                 regex, False if case was not ignored.
+            pattern:        Compiled regex object for regex (with ignore_case
+                applied), or None to compile it when needed. Results of the
+                same search should share one to save compiling the regex for
+                each of them. Defaults to None.
         """
         super(StringMatch, self).__init__()
         self.match = match
         self.regex = regex
         self.ignore_case = ignore_case
+        self.pattern = pattern
 
     def __str__(self):
         if self.regex:
@@ -197,15 +273,22 @@ class StringMatch(Match):
     __repr__ = __str__
 
     def format(self, decorate=True, min_width=0, max_width=0):
-        if self.regex:
+        # With no width limits and nothing to highlight, the match is already
+        # formatted.
+        if (min_width <= 0 and max_width <= 0 and
+                not (decorate and (self.pattern or self.regex))):
+            return self.match
+        pattern = self.pattern
+        if pattern is None and self.regex:
             re_flags = re.IGNORECASE if self.ignore_case else 0
+            pattern = re.compile(self.regex, re_flags)
         formatted = self.match
 
         # If too long, truncate.
         if max_width > 0 and len(formatted) > max_width:
             # If we've been given the search truncate intelligently, trying to
             # retain at least one match. Otherwise just truncate from the right
-            re_r = re.search(self.regex, formatted, flags=re_flags) if self.regex else None
+            re_r = pattern.search(formatted) if pattern else None
             start_pos = re_r.start(0) - 10 if re_r and re_r.start(0) > 10 else 0
             end_pos = start_pos + max_width
             if end_pos > len(formatted):
@@ -224,14 +307,38 @@ class StringMatch(Match):
                 formatted = formatted + self._RES_CONT
 
         # If decorating and we know the regex, highlight the search term.
-        if decorate and self.regex:
-            re_split = re.split('(%s)' % (self.regex), formatted, flags=re_flags)
-            for i in range(1, len(re_split), 2):
-                re_split[i] = ansi.decorate(re_split[i], ansi.BOLD, ansi.FG_RED)
-            formatted = ''.join(re_split)
-
-        # If too short, left pad.
-        lpad(formatted, min_width)
+        if decorate and pattern:
+            literal = None
+            if not self.ignore_case:
+                literal = _REGEX_LITERALS.get(self.regex, False)
+                if literal is False:
+                    literal = regex_literal(self.regex)
+                    if len(_REGEX_LITERALS) >= _CACHE_SIZE:
+                        _REGEX_LITERALS.clear()
+                    _REGEX_LITERALS[self.regex] = literal
+            if literal is not None:
+                # Searches are mostly for plain text, which can be highlighted
+                # by splitting on it rather than running the regex again.
+                formatted = ansi.decorate(literal, ansi.BOLD, ansi.FG_RED).join(
+                    formatted.split(literal))
+            else:
+                parts = []
+                end = 0
+                for match in pattern.finditer(formatted):
+                    if match.end() > match.start():
+                        parts.append(formatted[end:match.start()])
+                        parts.append(ansi.decorate(match.group(0), ansi.BOLD,
+                                                   ansi.FG_RED))
+                        end = match.end()
+                parts.append(formatted[end:])
+                formatted = ''.join(parts)
+
+        # If too short, left pad. Measure the visible width, as the string may
+        # now be decorated.
+        if min_width > 0:
+            curlen = ansi.length(formatted)
+            if curlen < min_width:
+                formatted = ' ' * (min_width - curlen) + formatted
 
         # Return whatever we have left.
         return formatted
@@ -244,6 +351,8 @@ class StringMatch(Match):
 
 class Location(object):
     """An abstract location of a single match to a search query."""
+    __slots__ = ()
+
     def __init__(self):
         """Initialises the Location."""
         pass
@@ -273,15 +382,20 @@ class Location(object):
         """
         raise NotImplementedError('Location must be subclassed')
 
+# Cache of (path, basename, dirname) tuples of located files, keyed by path.
+_SPLIT_PATHS = {}
+
 class TextFileLocation(Location):
     """The location of a match to a search query in a text file.
 
     Attributes:
         path:       String path of the file in which the match occurs.
         basename:   String name of the file.
-        dirname:    String path to the directory (including trailing separator).
+        dirname:    String path to the directory (including trailing separator),
+            or an empty string if the path has no directory component.
         line:       int 1-indexed line number of the match in the file.
     """
+    __slots__ = ('path', 'basename', 'dirname', 'line', '_line_str', '_length')
 
     def __init__(self, path, line=-1):
         """Initialises the Location.
@@ -292,10 +406,23 @@ class TextFileLocation(Location):
                 line number is not known or relevant.
         """
         super(TextFileLocation, self).__init__()
-        self.path = path
-        self.basename = os.path.basename(path)
-        self.dirname = os.path.dirname(path) + os.path.sep
+        # Files often have many matches, so share one copy of each path (and
+        # its parts) between all the locations in the same file.
+        split_path = _SPLIT_PATHS.get(path)
+        if split_path is None:
+            # Split the path with a single scan for its last separator.
+            sep_index = path.rfind(os.path.sep) + 1
+            split_path = (path, path[sep_index:], path[:sep_index])
+            if len(_SPLIT_PATHS) >= _CACHE_SIZE:
+                _SPLIT_PATHS.clear()
+            _SPLIT_PATHS[path] = split_path
+        self.path, self.basename, self.dirname = split_path
         self.line = line
+        # The printers measure every location at least once, so build the
+        # line number suffix and calculate the length up front, rather than
+        # converting the line number each time.
+        self._line_str = ':' + str(line) if line >= 0 else ''
+        self._length = len(path) + len(self._line_str)
 
     def __str__(self):
         if self.line < 0:
@@ -305,47 +432,29 @@ class TextFileLocation(Location):
     __repr__ = __str__
 
     def format(self, decorate=True, min_width=0, max_width=0):
-        def _format_path(max_width=0):
-            """Internal method to extract and format the path."""
-            formatted = ltrunc(self.path, max_width)
-            if decorate:
-                # If there is some of the dirname visible, split the string and
-                # format it.
-                basename_len = len(self.basename)
-                if len(formatted) > basename_len:
-                    dirname_part = ansi.decorate(formatted[:-basename_len], ansi.FG_YELLOW)
-                    basename_part = ansi.decorate(formatted[-basename_len:], ansi.BOLD, ansi.FG_YELLOW)
-                    formatted = dirname_part + basename_part
-                else:
-                    formatted = ansi.decorate(formatted, ansi.BOLD, ansi.FG_YELLOW)
-            return formatted
-
-        def _format_line():
-            """Internal method to extract and format the line number."""
-            if self.line < 0:
-                return ''
-            formatted = ':' + str(self.line)
-            # Decorate if necessary.
+        # Track the visible length of each part as it's built, rather than
+        # measuring the decorated string afterwards.
+        line_str = self._line_str
+        curlen = len(line_str)
+        if decorate and line_str:
+            line_str = ansi.decorate(line_str, ansi.FG_YELLOW)
+
+        # While we can afford to add more to the string, keep adding.
+        if max_width <= 0 or curlen < max_width:
+            path_str = ltrunc(self.path, max_width - curlen if max_width > 0
+                              else 0)
+            curlen += len(path_str)
             if decorate:
-                formatted = ansi.decorate(formatted, ansi.FG_YELLOW)
-            return formatted
-
-        if max_width > 0:
-            formatted = _format_line()
-            # While we can afford to add more to the string, keep adding.
-            curlen = ansi.length(formatted)
-            if curlen < max_width:
-                formatted = _format_path(max_width=max_width-curlen) + formatted
+                path_str = decorate_path(path_str, len(self.basename))
+            formatted = path_str + line_str
         else:
-            formatted = _format_path() + _format_line()
+            formatted = line_str
 
-        if min_width > 0:
-            # If too short, right pad.
-            curlen = ansi.length(formatted)
-            if curlen < min_width:
-                formatted = formatted + ' ' * (min_width - curlen)
+        # If too short, right pad.
+        if min_width > 0 and curlen < min_width:
+            formatted = formatted + ' ' * (min_width - curlen)
 
         return formatted
 
     def length(self):
-        return len('%s:%d' % (self.path, self.line))
+        return self._length